@@ -16,13 +16,15 @@ Last Updated: 2025-05-24
 """
 
 import os
+import re
 import sys
-import time
 import signal
+import asyncio
 import subprocess
-import threading
+import math
 import logging
 import argparse
+import tempfile
 
 # Configure logging
 logging.basicConfig(
@@ -59,6 +61,7 @@ YOUTUBE_KEY = "your-stream-key-here"
 # Layout configuration
 LAYOUT = "side-by-side"  # Options: "side-by-side", "grid", "switch"
 SWITCH_INTERVAL = 10  # Seconds between camera switches (only if LAYOUT="switch")
+SWITCH_SCHEDULE_DURATION = 24 * 60 * 60  # Seconds of switching scheduled per run
 
 # Quality settings
 QUALITY = {
@@ -70,15 +73,66 @@ QUALITY = {
 }
 # ======================================
 
+# Quality and layout values parsed once instead of on every command build
+WIDTH, HEIGHT = map(int, QUALITY["resolution"].split("x"))
+FPS = float(QUALITY["framerate"])
+GOP = int(FPS * 2)
+KEYINT_MIN = int(FPS)
+
+# Grid dimensions (roughly square) and cell size for the grid layout
+GRID_ROWS = math.ceil(math.sqrt(len(CAMERA_CONFIG)))
+GRID_COLS = (len(CAMERA_CONFIG) + GRID_ROWS - 1) // GRID_ROWS
+CELL_W = WIDTH // GRID_COLS
+CELL_H = HEIGHT // GRID_ROWS
+
 # YouTube RTMP URL
 YOUTUBE_URL = f"rtmp://a.rtmp.youtube.com/live2/{YOUTUBE_KEY}"
 
-# Global process variable
-stream_process = None
-stop_event = threading.Event()
+# Low-latency RTSP input options: skip stream probing and demuxer buffering
+# so packets flow as soon as the camera connection is up
+RTSP_INPUT_ARGS = [
+    "-rtsp_transport", "tcp",            # Use TCP (more reliable than UDP)
+    "-probesize", "32",                  # Minimal probing before decoding
+    "-analyzeduration", "0",             # Don't analyze the stream up front
+    "-fflags", "nobuffer+discardcorrupt",
+    "-flags", "low_delay",
+    "-use_wallclock_as_timestamps", "1", # Timestamp packets on arrival
+]
+
+# Hardware H.264 encoders, in order of preference
+HW_ENCODERS = ["h264_nvenc", "h264_qsv", "h264_vaapi"]
+
+# VAAPI render node (Intel/AMD GPUs on Linux)
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+# FFmpeg global options that open the device used by a hardware encoder
+HW_DEVICE_ARGS = {
+    "h264_qsv": ["-init_hw_device", "qsv=hw", "-filter_hw_device", "hw"],
+    "h264_vaapi": ["-vaapi_device", VAAPI_DEVICE],
+}
+
+# Filters that upload CPU frames to the device for QSV and VAAPI
+HW_UPLOAD_FILTERS = {
+    "h264_qsv": "format=nv12,hwupload=extra_hw_frames=64",
+    "h264_vaapi": "format=nv12,hwupload",
+}
+
+# CUDA filters used to keep the NVENC graph on the GPU; not every build has them
+CUDA_FILTERS = ["scale_cuda", "overlay_cuda"]
+
+# Cached result of detect_gpu()
+video_encoder = None
+
+# Whether FFmpeg has all of CUDA_FILTERS, set by check_dependencies()
+cuda_filters_available = False
+
+# sendcmd schedule written for the switch layout, removed when streaming stops
+switch_schedule_file = None
 
 def check_dependencies():
     """Check if FFmpeg is installed with required capabilities."""
+    global cuda_filters_available
+    
     try:
         # Check if FFmpeg is installed
         result = subprocess.run(
@@ -102,6 +156,10 @@ def check_dependencies():
         
         if "overlay" not in result.stdout or "hstack" not in result.stdout:
             logger.warning("FFmpeg might not have all required filters. Complex layouts might not work.")
+        
+        # Filter lines look like " ... scale_cuda        V->V       GPU accelerated..."
+        filter_names = {line.split()[1] for line in result.stdout.splitlines() if len(line.split()) > 2}
+        cuda_filters_available = all(name in filter_names for name in CUDA_FILTERS)
             
         return True
     except (subprocess.SubprocessError, FileNotFoundError):
@@ -109,6 +167,105 @@ def check_dependencies():
         logger.error("Please install FFmpeg: https://ffmpeg.org/download.html")
         return False
 
+def encoder_args(encoder):
+    """Return the FFmpeg video encoder options used for the given encoder."""
+    if encoder == "h264_nvenc":
+        # NVENC hardware encoder, constant bitrate with low-latency tuning
+        return [
+            "-c:v", "h264_nvenc",
+            "-preset", "p4",
+            "-tune", "ll",
+            "-rc", "cbr",
+            "-b:v", QUALITY["bitrate"],
+            "-maxrate", QUALITY["bitrate"],
+            "-bufsize", double_bitrate(QUALITY["bitrate"]),
+            "-bf", "0",
+            "-zerolatency", "1",
+        ]
+    elif encoder == "h264_qsv":
+        # Intel Quick Sync encoder
+        return [
+            "-c:v", "h264_qsv",
+            "-preset", "veryfast",
+            "-look_ahead", "0",
+            "-b:v", QUALITY["bitrate"],
+        ]
+    elif encoder == "h264_vaapi":
+        # VAAPI encoder (Intel/AMD on Linux)
+        return [
+            "-c:v", "h264_vaapi",
+            "-b:v", QUALITY["bitrate"],
+        ]
+    else:
+        # Software encoder; hardware encoders take nv12, libx264 needs yuv420p
+        return [
+            "-c:v", "libx264",
+            "-preset", QUALITY["preset"],
+            "-tune", "zerolatency",
+            "-b:v", QUALITY["bitrate"],
+            "-keyint_min", str(KEYINT_MIN),
+            "-pix_fmt", "yuv420p",
+        ]
+
+def encoder_works(encoder):
+    """Check that an encoder can encode a test frame on this machine.
+    
+    Distribution builds list hardware encoders whether or not the matching
+    hardware is present, so being listed by -encoders is not enough.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    cmd.extend(HW_DEVICE_ARGS.get(encoder, []))
+    cmd.extend(["-f", "lavfi", "-i", "color=s=256x256:d=0.1"])
+    if encoder in HW_UPLOAD_FILTERS:
+        cmd.extend(["-vf", HW_UPLOAD_FILTERS[encoder]])
+    # Use the real encoder options: older builds reject some of them
+    cmd.extend(["-frames:v", "1"] + encoder_args(encoder) + ["-f", "null", "-"])
+    
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15)
+        return result.returncode == 0
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return False
+
+def detect_gpu():
+    """Pick the video encoder once: NVENC, then QSV, then VAAPI, then libx264."""
+    global video_encoder
+    
+    if video_encoder is None:
+        video_encoder = "libx264"
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-hide_banner", "-encoders"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True
+            )
+            for encoder in HW_ENCODERS:
+                if encoder in result.stdout and encoder_works(encoder):
+                    video_encoder = encoder
+                    break
+        except (subprocess.SubprocessError, FileNotFoundError):
+            pass
+            
+    return video_encoder
+
+def probe_camera(url):
+    """Return the (width, height) of a camera's video stream, or None if unknown."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-rtsp_transport", "tcp",
+             "-select_streams", "v:0", "-show_entries", "stream=width,height",
+             "-of", "csv=p=0", url],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=15
+        )
+        width, height = result.stdout.strip().split(",")[:2]
+        return int(width), int(height)
+    except (subprocess.SubprocessError, FileNotFoundError, ValueError):
+        return None
+
 def validate_config():
     """Validate the camera configuration."""
     if not CAMERA_CONFIG:
@@ -132,93 +289,178 @@ def validate_config():
 
 def build_ffmpeg_command():
     """Build the FFmpeg command to combine camera streams."""
-    cmd = ["ffmpeg"]
+    # Only let FFmpeg report genuine warnings and errors
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-loglevel", "warning"]
+    
+    encoder = detect_gpu()
+    
+    # Keep frames on the GPU from decode to encode when NVENC is available and
+    # the build has the CUDA filters; otherwise NVENC encodes the CPU graph
+    use_cuda = encoder == "h264_nvenc" and cuda_filters_available
+    if use_cuda:
+        # One shared CUDA device for decoding, filtering and encoding
+        cmd.extend(["-init_hw_device", "cuda=cu:0", "-filter_hw_device", "cu"])
+    else:
+        # QSV and VAAPI open their device for the final upload filter
+        cmd.extend(HW_DEVICE_ARGS.get(encoder, []))
     
     # Input streams
     for i, camera in enumerate(CAMERA_CONFIG):
-        cmd.extend(["-rtsp_transport", "tcp", "-i", camera["rtsp_url"]])
+        if use_cuda:
+            cmd.extend([
+                "-hwaccel", "cuda",
+                "-hwaccel_device", "cu",
+                "-hwaccel_output_format", "cuda",
+            ])
+        cmd.extend(RTSP_INPUT_ARGS + ["-i", camera["rtsp_url"]])
     
     # Add complex filter based on layout
-    filter_complex = build_filter_complex()
+    filter_complex = build_filter_complex(use_cuda)
+    output_label = "[outv]"
+    
+    # QSV and VAAPI compose on the CPU, then upload the result once
+    if encoder in HW_UPLOAD_FILTERS:
+        filter_complex += f";[outv]{HW_UPLOAD_FILTERS[encoder]}[outhw]"
+        output_label = "[outhw]"
+    
     cmd.extend(["-filter_complex", filter_complex])
     
     # Output settings
     cmd.extend([
-        "-map", "[outv]",     # Use the output video from the filter complex
+        "-map", output_label, # Use the output video from the filter complex
         "-map", "0:a",        # Use audio from the first input (if available)
-        "-c:v", "libx264",    # Video codec
-        "-preset", QUALITY["preset"],
-        "-tune", "zerolatency",
-        "-b:v", QUALITY["bitrate"],
+    ])
+    
+    cmd.extend(encoder_args(encoder))
+    
+    cmd.extend([
         "-r", QUALITY["framerate"],
-        "-g", str(int(float(QUALITY["framerate"]) * 2)),  # GOP size
-        "-keyint_min", str(int(float(QUALITY["framerate"]))),
-        "-pix_fmt", "yuv420p",
+        "-g", str(GOP),       # GOP size
         "-c:a", "aac",
         "-b:a", QUALITY["audio_bitrate"],
+        "-max_delay", "0",
+        "-muxdelay", "0",
+        "-muxpreload", "0",
         "-f", "flv",
         YOUTUBE_URL
     ])
     
     return cmd
 
-def build_filter_complex():
-    """Build the filter complex string based on the selected layout."""
+def double_bitrate(bitrate):
+    """Return twice the given FFmpeg bitrate string (e.g. "3000k" -> "6000k")."""
+    unit = bitrate[-1] if bitrate[-1].isalpha() else ""
+    value = float(bitrate[:-1] if unit else bitrate) * 2
+    if value.is_integer():
+        value = int(value)
+    return f"{value}{unit}"
+
+def build_cuda_overlay(tiles):
+    """Compose CUDA tiles onto a black canvas with an overlay_cuda chain.
+    
+    tiles is a list of (label, x, y) tuples. FFmpeg has no CUDA hstack/xstack,
+    so tiles are overlaid one by one onto a canvas uploaded to the GPU.
+    """
+    filters = [
+        f"color=c=black:s={QUALITY['resolution']}:r={QUALITY['framerate']},"
+        f"format=nv12,hwupload[base]"
+    ]
+    
+    previous = "base"
+    for i, (label, x, y) in enumerate(tiles):
+        output = "outv" if i == len(tiles) - 1 else f"tmp{i}"
+        filters.append(f"[{previous}][{label}]overlay_cuda=x={x}:y={y}:shortest=1[{output}]")
+        previous = output
+        
+    return filters
+
+def write_switch_schedule(num_cameras):
+    """Write a sendcmd schedule cycling streamselect through the inputs.
+    
+    One command is issued per SWITCH_INTERVAL, covering a day of streaming,
+    so FFmpeg acts only at camera transitions instead of evaluating a
+    time expression on every frame. Returns the path of the schedule file.
+    """
+    global switch_schedule_file
+    
+    switches = int(SWITCH_SCHEDULE_DURATION / SWITCH_INTERVAL)
+    with tempfile.NamedTemporaryFile("w", prefix="switch_", suffix=".cmd", delete=False) as schedule:
+        for n in range(switches):
+            schedule.write(f"{n * SWITCH_INTERVAL} streamselect map {n % num_cameras};\n")
+    
+    switch_schedule_file = schedule.name
+    return schedule.name
+
+def filter_path(path):
+    """Quote a file path for use as a filter option in a filter graph.
+    
+    Windows paths use backslashes and a drive colon, both special to FFmpeg;
+    forward slashes work everywhere and the colon is escaped for the option
+    parser, with the quotes keeping that escape intact at graph level.
+    """
+    path = path.replace("\\", "/").replace(":", "\\:")
+    return f"'{path}'"
+
+def fit_input(index, width, height, use_cuda=False):
+    """Return the filter chain fitting input #index to width x height as [v{index}].
+    
+    Cameras whose probed resolution already matches are passed through
+    without a scale filter.
+    """
+    if CAMERA_CONFIG[index].get("native_resolution") == (width, height):
+        return f"[{index}:v]null[v{index}]"
+    if use_cuda:
+        return f"[{index}:v]scale_cuda={width}:{height}:format=nv12[v{index}]"
+    return f"[{index}:v]scale={width}:{height}[v{index}]"
+
+def build_filter_complex(use_cuda=False):
+    """Build the filter complex string based on the selected layout.
+    
+    With use_cuda, inputs are expected as CUDA frames and the whole graph
+    runs on the GPU, producing nv12 CUDA frames for h264_nvenc.
+    """
     num_cameras = len(CAMERA_CONFIG)
     
     if LAYOUT == "switch":
-        # Create a switching layout using the overlay filter and enable timestamps
-        # For n inputs, we create n-1 overlays that switch between sources
+        # Create a switching layout with a single streamselect filter, so only
+        # the visible input is passed through and nothing is composited
         filters = []
         for i in range(num_cameras):
             # Scale each input to the target resolution
-            filters.append(f"[{i}:v]scale={QUALITY['resolution']},setpts=PTS-STARTPTS[v{i}]")
-        
-        # Create a switching mechanism
-        switch_expr = ""
-        for i in range(num_cameras):
-            if i > 0:
-                switch_expr += "+"
-            start_time = i * SWITCH_INTERVAL
-            end_time = (i+1) * SWITCH_INTERVAL
-            # This creates a loop by using the modulo of the timestamp
-            switch_expr += f"if(mod(t,{num_cameras*SWITCH_INTERVAL})<={end_time}*gte(mod(t,{num_cameras*SWITCH_INTERVAL}),{start_time}),1,0)"
+            if use_cuda:
+                filters.append(f"[{i}:v]scale_cuda={WIDTH}:{HEIGHT}:format=nv12,setpts=PTS-STARTPTS[v{i}]")
+            else:
+                filters.append(f"[{i}:v]scale={QUALITY['resolution']},setpts=PTS-STARTPTS[v{i}]")
         
-        for i in range(num_cameras):
-            filters.append(f"[v{i}]split=1[v{i}out]")
+        # streamselect's map option is not an expression, so the active input
+        # is changed by a sendcmd schedule riding on the first input
+        schedule_file = write_switch_schedule(num_cameras)
+        filters.append(f"[v0]sendcmd=f={filter_path(schedule_file)}[v0cmd]")
         
-        # Build the chain of overlays
-        filter_chain = f"[v0out]"
-        for i in range(1, num_cameras):
-            filter_chain += f"[v{i}out]overlay=shortest=1:enable='{switch_expr}',"
-            if i < num_cameras - 1:
-                filter_chain += f"[tmp{i}];[tmp{i}]"
-        filter_chain += "[outv]"
+        input_list = "[v0cmd]" + "".join(f"[v{i}]" for i in range(1, num_cameras))
+        filters.append(f"{input_list}streamselect=inputs={num_cameras}:map=0[outv]")
         
-        return ";".join(filters) + ";" + filter_chain
+        return ";".join(filters)
         
     elif LAYOUT == "grid":
         # Create a grid layout (2x2 or similar)
         filters = []
         
-        # Determine grid dimensions (roughly square)
-        import math
-        grid_size = math.ceil(math.sqrt(num_cameras))
-        rows = grid_size
-        cols = (num_cameras + rows - 1) // rows
-        cell_width = int(int(QUALITY["resolution"].split("x")[0]) / cols)
-        cell_height = int(int(QUALITY["resolution"].split("x")[1]) / rows)
-        
         # Scale each input to the appropriate cell size
         for i in range(num_cameras):
-            filters.append(f"[{i}:v]scale={cell_width}:{cell_height}[v{i}]")
+            filters.append(fit_input(i, CELL_W, CELL_H, use_cuda))
         
-        # Build the grid using the xstack filter
+        if use_cuda:
+            tiles = [(f"v{i}", (i % GRID_COLS) * CELL_W, (i // GRID_COLS) * CELL_H)
+                     for i in range(num_cameras)]
+            return ";".join(filters + build_cuda_overlay(tiles))
+        
+        # Build the grid using the xstack filter (layout positions are in pixels)
         xstack_filter = "xstack=inputs=" + str(num_cameras) + ":layout="
         for i in range(num_cameras):
-            row = i // cols
-            col = i % cols
-            xstack_filter += f"{col}_{row}"
+            row = i // GRID_COLS
+            col = i % GRID_COLS
+            xstack_filter += f"{col * CELL_W}_{row * CELL_H}"
             if i < num_cameras - 1:
                 xstack_filter += "|"
         
@@ -231,12 +473,16 @@ def build_filter_complex():
     else:  # Default: side-by-side
         # Create a side-by-side layout
         filters = []
-        scaled_width = int(int(QUALITY["resolution"].split("x")[0]) / num_cameras)
-        full_height = int(QUALITY["resolution"].split("x")[1])
+        scaled_width = WIDTH // num_cameras
+        full_height = HEIGHT
         
         # Scale each input
         for i in range(num_cameras):
-            filters.append(f"[{i}:v]scale={scaled_width}:{full_height}[v{i}]")
+            filters.append(fit_input(i, scaled_width, full_height, use_cuda))
+        
+        if use_cuda:
+            tiles = [(f"v{i}", i * scaled_width, 0) for i in range(num_cameras)]
+            return ";".join(filters + build_cuda_overlay(tiles))
         
         # Use hstack to place them side by side
         input_list = "".join(f"[v{i}]" for i in range(num_cameras))
@@ -244,11 +490,31 @@ def build_filter_complex():
         
         return ";".join(filters)
 
-def start_streaming():
-    """Start streaming with the combined camera feeds."""
-    global stream_process
+async def read_lines(stream):
+    """Yield stripped, non-empty lines from an FFmpeg stderr stream as bytes.
+    
+    FFmpeg ends its progress lines with a bare carriage return, which
+    StreamReader.readline() does not treat as a line ending. Lines are left
+    undecoded so callers only pay for decoding what they actually log.
+    """
+    buffer = b""
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            break
+        lines = re.split(rb"[\r\n]", buffer + chunk)
+        buffer = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line
     
-    # Print header
+    buffer = buffer.strip()
+    if buffer:
+        yield buffer
+
+def print_header():
+    """Log the stream settings before starting FFmpeg."""
     logger.info("=" * 50)
     logger.info("Multiple Camera Combined Stream to YouTube Live")
     logger.info("=" * 50)
@@ -259,75 +525,106 @@ def start_streaming():
     logger.info(f"Streaming to: YouTube Live")
     logger.info("Press Ctrl+C to stop streaming")
     logger.info("=" * 50)
+
+def exec_streaming():
+    """Replace this process with FFmpeg for layouts that need no supervision.
+    
+    FFmpeg inherits the terminal, so its warnings and Ctrl+C go straight to
+    it; nothing is written to the log file once it has started.
+    """
+    print_header()
     
     # Build and execute the FFmpeg command
     cmd = build_ffmpeg_command()
     logger.info(f"Command: {' '.join(cmd)}")
+    logger.info("Starting streaming process...")
     
-    def signal_handler(sig, frame):
-        logger.info("\nStopping stream (Ctrl+C detected)...")
-        stop_streaming()
-        sys.exit(0)
+    # Flush the log handlers before the process image is replaced
+    logging.shutdown()
+    os.execvp(cmd[0], cmd)
+
+async def start_streaming():
+    """Start streaming with the combined camera feeds."""
+    print_header()
     
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    # Build and execute the FFmpeg command
+    cmd = build_ffmpeg_command()
+    logger.info(f"Command: {' '.join(cmd)}")
+    if switch_schedule_file:
+        logger.info(f"Switch schedule: {switch_schedule_file}")
+    
+    logger.info("Starting streaming process...")
+    stream_process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    
+    logger.info(f"Stream started with PID: {stream_process.pid}")
     
     try:
-        logger.info("Starting streaming process...")
-        stream_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            bufsize=1,
-            text=True
-        )
-        
-        logger.info(f"Stream started with PID: {stream_process.pid}")
+        # Monitor process and print output; with -loglevel warning every
+        # line FFmpeg writes is already a warning or an error
+        async for line in read_lines(stream_process.stderr):
+            logger.warning(f"FFmpeg: {line.decode(errors='replace')}")
         
-        # Monitor process and print output
-        for line in stream_process.stderr:
-            if stop_event.is_set():
-                break
-                
-            if "error" in line.lower():
-                logger.error(f"FFmpeg: {line.strip()}")
-            elif "warning" in line.lower():
-                logger.warning(f"FFmpeg: {line.strip()}")
-            else:
-                logger.info(f"FFmpeg: {line.strip()}")
-                
-    except KeyboardInterrupt:
-        signal_handler(signal.SIGINT, None)
+        return await stream_process.wait()
+    finally:
+        # Also reached when the task is cancelled by the signal handler
+        await stop_streaming(stream_process)
+        remove_switch_schedule()
+
+def remove_switch_schedule():
+    """Delete the switch layout's sendcmd schedule, if one was written."""
+    global switch_schedule_file
     
-    return stream_process.poll()
+    if switch_schedule_file:
+        try:
+            os.remove(switch_schedule_file)
+        except OSError:
+            pass
+        switch_schedule_file = None
 
-def stop_streaming():
+async def stop_streaming(stream_process):
     """Stop the streaming process."""
-    global stream_process
-    
-    if stream_process and stream_process.poll() is None:
+    if stream_process.returncode is None:
         logger.info("Terminating FFmpeg process...")
-        stop_event.set()
+        stream_process.terminate()
         
-        # Try to send a quit signal to FFmpeg first (more graceful than terminate)
+        # If still running, force kill
         try:
-            stream_process.communicate(input="q", timeout=3)
-        except (subprocess.TimeoutExpired, BrokenPipeError):
-            pass
-            
-        # If it's still running, try to terminate
-        if stream_process.poll() is None:
-            stream_process.terminate()
-            time.sleep(1)
-            
-            # If still running, force kill
-            if stream_process.poll() is None:
-                stream_process.kill()
+            await asyncio.wait_for(stream_process.wait(), timeout=3)
+        except asyncio.TimeoutError:
+            stream_process.kill()
+            await stream_process.wait()
                 
         logger.info("Streaming stopped")
 
+async def main_async():
+    """Run the stream until FFmpeg exits or Ctrl+C/SIGTERM is received."""
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(start_streaming())
+    
+    def shutdown():
+        logger.info("Stopping stream (Ctrl+C detected)...")
+        task.cancel()
+    
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, shutdown)
+        except NotImplementedError:
+            # Windows: Ctrl+C raises KeyboardInterrupt, which cancels the task
+            pass
+    
+    try:
+        return await task
+    except asyncio.CancelledError:
+        return 0
+
 def parse_arguments():
     """Parse command line arguments."""
+    global LAYOUT, SWITCH_INTERVAL
+    
     parser = argparse.ArgumentParser(description='Combined Camera Stream to YouTube Live')
     parser.add_argument('--layout', choices=['side-by-side', 'grid', 'switch'],
                         default=LAYOUT, help='Layout type for combining streams')
@@ -335,8 +632,10 @@ def parse_arguments():
                         help='Interval in seconds between camera switches (for switch layout)')
     args = parser.parse_args()
     
+    if args.switch_interval < 1:
+        parser.error("--switch-interval must be at least 1 second")
+    
     # Update global variables based on args
-    global LAYOUT, SWITCH_INTERVAL
     LAYOUT = args.layout
     SWITCH_INTERVAL = args.switch_interval
 
@@ -352,11 +651,33 @@ if __name__ == "__main__":
     if not check_dependencies():
         sys.exit(1)
     
-    # Start streaming
+    # Probe each camera's native resolution so matching inputs skip scaling;
+    # the switch layout always scales to the full frame, so it doesn't need it
+    if LAYOUT != "switch":
+        for idx, camera in enumerate(CAMERA_CONFIG):
+            name = camera.get("name", f"Camera {idx+1}")
+            camera["native_resolution"] = probe_camera(camera["rtsp_url"])
+            if camera["native_resolution"]:
+                logger.info(f"{name} native resolution: {camera['native_resolution'][0]}x{camera['native_resolution'][1]}")
+            else:
+                logger.warning(f"{name}: could not probe resolution, input will be scaled")
+    
+    # Pick the encoder once, before the command is built
+    if detect_gpu() == "libx264":
+        logger.info("No hardware encoder found: using libx264 software encoder")
+    else:
+        logger.info(f"Hardware encoding available: using {detect_gpu()}")
+        if detect_gpu() == "h264_nvenc" and not cuda_filters_available:
+            logger.info(f"FFmpeg lacks {' and '.join(CUDA_FILTERS)}: combining the cameras on the CPU")
+    
+    # Start streaming. The switch layout keeps Python around to supervise
+    # FFmpeg and its schedule; static layouts hand the process over to FFmpeg,
+    # except on Windows, where os.execvp would detach FFmpeg from the console.
     try:
-        exit_code = start_streaming()
+        if LAYOUT != "switch" and os.name != "nt":
+            exec_streaming()
+        exit_code = asyncio.run(main_async())
         sys.exit(exit_code)
     except Exception as e:
         logger.error(f"Error: {e}")
-        stop_streaming()
         sys.exit(1)
@@ -4,7 +4,7 @@ Multi-Camera RTSP to YouTube Live Streaming Tool
 
 This script streams video from multiple TP-Link Tapo C121 cameras (via RTSP) 
 to multiple YouTube Live streams simultaneously.
-It uses FFmpeg for simple, reliable streaming.
+It uses a single FFmpeg process with one output per camera.
 
 Usage:
   python multi_stream.py
@@ -16,11 +16,11 @@ Last Updated: 2025-05-24
 """
 
 import os
+import re
 import sys
-import time
 import signal
+import asyncio
 import subprocess
-import threading
 import logging
 
 # Configure logging
@@ -83,22 +83,152 @@ DEFAULT_QUALITY = {
     "preset": "ultrafast",
 }
 
-# Global dictionary to keep track of all processes
-stream_processes = {}
-stop_event = threading.Event()
+# Low-latency RTSP input options: skip stream probing and demuxer buffering
+# so packets flow as soon as the camera connection is up
+RTSP_INPUT_ARGS = [
+    "-rtsp_transport", "tcp",            # Use TCP (more reliable than UDP)
+    "-probesize", "32",                  # Minimal probing before decoding
+    "-analyzeduration", "0",             # Don't analyze the stream up front
+    "-fflags", "nobuffer+discardcorrupt",
+    "-flags", "low_delay",
+    "-use_wallclock_as_timestamps", "1", # Timestamp packets on arrival
+]
+
+# FFmpeg 6.1+ starts log lines about an input or output with "[in#N/..." or
+# "[out#N/..."; older versions only mention the camera's URL or stream key
+STREAM_TAG_RE = re.compile(rb"^\[(?:in|out)#(\d+)")
+
+# Seconds to wait before restarting FFmpeg after it exits
+RESTART_DELAY = 5
+
+# Seconds between checks for cameras that could not be reached
+OFFLINE_RETRY_INTERVAL = 60
+
+# Seconds to wait for a camera to answer a reachability check
+CAMERA_CHECK_TIMEOUT = 15
+
+# Hardware H.264 encoders, in order of preference
+HW_ENCODERS = ["h264_nvenc", "h264_qsv", "h264_vaapi"]
+
+# VAAPI render node (Intel/AMD GPUs on Linux)
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+# FFmpeg global options that open the device used by a hardware encoder
+HW_DEVICE_ARGS = {
+    "h264_qsv": ["-init_hw_device", "qsv=hw", "-filter_hw_device", "hw"],
+    "h264_vaapi": ["-vaapi_device", VAAPI_DEVICE],
+}
+
+# Filters that upload CPU frames to the device for QSV and VAAPI
+HW_UPLOAD_FILTERS = {
+    "h264_qsv": "format=nv12,hwupload=extra_hw_frames=64",
+    "h264_vaapi": "format=nv12,hwupload",
+}
+
+# Cached result of detect_gpu()
+video_encoder = None
 
 def check_dependencies():
-    """Check if FFmpeg is installed."""
+    """Check if FFmpeg and ffprobe are installed."""
     try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        for tool in ("ffmpeg", "ffprobe"):
+            subprocess.run([tool, "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
         return True
     except (subprocess.SubprocessError, FileNotFoundError):
-        logger.error("Error: FFmpeg is not installed or not in the PATH.")
+        logger.error("Error: FFmpeg (with ffprobe) is not installed or not in the PATH.")
         logger.error("Please install FFmpeg: https://ffmpeg.org/download.html")
         return False
 
-def build_ffmpeg_command(camera_config):
-    """Build the FFmpeg command for a specific camera configuration."""
+def encoder_args(encoder, quality):
+    """Return the FFmpeg video encoder options for the given encoder and quality."""
+    if encoder == "h264_nvenc":
+        return [
+            "-c:v", "h264_nvenc",             # NVIDIA hardware H.264 encoder
+            "-preset", "p4",                  # Balanced NVENC preset
+            "-tune", "ll",                    # Low latency
+            "-rc", "cbr",                     # Constant bitrate for RTMP
+            "-b:v", quality["bitrate"],       # Video bitrate
+            "-maxrate", quality["bitrate"],
+            "-bufsize", double_bitrate(quality["bitrate"]),
+            "-g", str(int(float(quality["framerate"]) * 2)),  # 2s GOP
+            "-bf", "0",                       # No B-frames
+            "-zerolatency", "1",              # No reordering delay
+        ]
+    elif encoder == "h264_qsv":
+        return [
+            "-c:v", "h264_qsv",               # Intel Quick Sync H.264 encoder
+            "-preset", "veryfast",
+            "-look_ahead", "0",               # No lookahead latency
+            "-b:v", quality["bitrate"],       # Video bitrate
+            "-g", str(int(float(quality["framerate"]) * 2)),  # 2s GOP
+        ]
+    elif encoder == "h264_vaapi":
+        return [
+            "-c:v", "h264_vaapi",             # VAAPI H.264 encoder (Intel/AMD)
+            "-b:v", quality["bitrate"],       # Video bitrate
+            "-g", str(int(float(quality["framerate"]) * 2)),  # 2s GOP
+        ]
+    else:
+        return [
+            "-c:v", "libx264",                # Use H.264 codec
+            "-preset", quality["preset"],     # Encoding preset
+            "-tune", "zerolatency",           # Minimize latency
+            "-b:v", quality["bitrate"],       # Video bitrate
+            "-pix_fmt", "yuv420p",            # Required for compatibility
+        ]
+
+def encoder_works(encoder):
+    """Check that an encoder can encode a test frame on this machine.
+    
+    Distribution builds list hardware encoders whether or not the matching
+    hardware is present, so being listed by -encoders is not enough.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    cmd.extend(HW_DEVICE_ARGS.get(encoder, []))
+    cmd.extend(["-f", "lavfi", "-i", "color=s=256x256:d=0.1"])
+    if encoder in HW_UPLOAD_FILTERS:
+        cmd.extend(["-vf", HW_UPLOAD_FILTERS[encoder]])
+    # Use the real encoder options: older builds reject some of them
+    cmd.extend(["-frames:v", "1"] + encoder_args(encoder, DEFAULT_QUALITY) + ["-f", "null", "-"])
+    
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15)
+        return result.returncode == 0
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return False
+
+def detect_gpu():
+    """Pick the video encoder once: NVENC, then QSV, then VAAPI, then libx264."""
+    global video_encoder
+    
+    if video_encoder is None:
+        video_encoder = "libx264"
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-hide_banner", "-encoders"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True
+            )
+            for encoder in HW_ENCODERS:
+                if encoder in result.stdout and encoder_works(encoder):
+                    video_encoder = encoder
+                    break
+        except (subprocess.SubprocessError, FileNotFoundError):
+            pass
+            
+    return video_encoder
+
+def double_bitrate(bitrate):
+    """Return twice the given FFmpeg bitrate string (e.g. "2000k" -> "4000k")."""
+    unit = bitrate[-1] if bitrate[-1].isalpha() else ""
+    value = float(bitrate[:-1] if unit else bitrate) * 2
+    if value.is_integer():
+        value = int(value)
+    return f"{value}{unit}"
+
+def build_output_args(index, camera_config):
+    """Build the FFmpeg output block that sends input #index to its YouTube stream."""
     # Get quality settings, using defaults if not specified
     quality = DEFAULT_QUALITY.copy()
     if "quality" in camera_config:
@@ -107,107 +237,237 @@ def build_ffmpeg_command(camera_config):
     # YouTube RTMP URL
     youtube_url = f"rtmp://a.rtmp.youtube.com/live2/{camera_config['youtube_key']}"
     
-    # Build the FFmpeg command
-    cmd = [
-        "ffmpeg",
-        "-rtsp_transport", "tcp",         # Use TCP (more reliable than UDP)
-        "-i", camera_config["rtsp_url"],  # Input from RTSP stream
-        
-        # Video encoding settings
-        "-c:v", "libx264",                # Use H.264 codec
-        "-preset", quality["preset"],     # Encoding preset
-        "-tune", "zerolatency",           # Minimize latency
-        "-b:v", quality["bitrate"],       # Video bitrate
+    args = [
+        "-map", f"{index}:v",             # Video from this camera's input
+        "-map", f"{index}:a?",            # Audio too, if the camera has any
+    ]
+    
+    encoder = detect_gpu()
+    
+    # Video encoding settings
+    args.extend(encoder_args(encoder, quality))
+    
+    # Resolution; QSV and VAAPI scale on the CPU, then upload to the device
+    if encoder in HW_UPLOAD_FILTERS:
+        width, height = quality["resolution"].split("x")
+        args.extend(["-vf", f"scale={width}:{height},{HW_UPLOAD_FILTERS[encoder]}"])
+    else:
+        args.extend(["-s", quality["resolution"]])
+    
+    args.extend([
         "-r", quality["framerate"],       # Frame rate
-        "-s", quality["resolution"],      # Resolution
-        "-pix_fmt", "yuv420p",            # Required for compatibility
         
         # Audio settings
         "-c:a", "aac",                    # AAC audio codec
         "-b:a", quality["audio_bitrate"], # Audio bitrate
         
         # Output settings
-        "-f", "flv",                      # FLV format for RTMP
-        youtube_url                       # YouTube stream URL
-    ]
+        "-flags", "+global_header",       # The tee muxer can't request it itself
+        "-max_delay", "0",                # Don't hold packets in the muxer
+        "-muxdelay", "0",
+        "-muxpreload", "0",
+        
+        # onfail=ignore keeps a failed YouTube connection from stopping the
+        # other cameras; a tee whose only output fails still aborts, so a
+        # null output is added for it to fall back on
+        "-f", "tee",
+        f"[f=flv:onfail=ignore]{youtube_url}|[f=null]-",
+    ])
+    
+    return args
+
+def build_ffmpeg_command(camera_configs):
+    """Build a single FFmpeg command streaming every camera to its own YouTube stream.
+    
+    All cameras are read as inputs of one process, followed by one output
+    block per camera. Each NVENC output still opens its own CUDA context.
+    """
+    # Only let FFmpeg report genuine warnings and errors
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-loglevel", "warning"]
+    
+    # Open the QSV or VAAPI device shared by every output's encoder, if needed
+    cmd.extend(HW_DEVICE_ARGS.get(detect_gpu(), []))
+    
+    # Input streams
+    for camera_config in camera_configs:
+        cmd.extend(RTSP_INPUT_ARGS + ["-i", camera_config["rtsp_url"]])
+    
+    # One output per camera, in the same order as the inputs
+    for index, camera_config in enumerate(camera_configs):
+        cmd.extend(build_output_args(index, camera_config))
     
     return cmd
 
-def stream_camera(camera_config):
-    """Stream a single camera to YouTube in its own thread."""
-    camera_name = camera_config["name"]
-    logger.info(f"Starting stream for camera: {camera_name}")
+async def read_lines(stream):
+    """Yield stripped, non-empty lines from an FFmpeg stderr stream as bytes.
     
-    # Build the FFmpeg command
-    ffmpeg_cmd = build_ffmpeg_command(camera_config)
+    FFmpeg ends its progress lines with a bare carriage return, which
+    StreamReader.readline() does not treat as a line ending. Lines are left
+    undecoded so callers only pay for decoding what they actually log.
+    """
+    buffer = b""
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            break
+        lines = re.split(rb"[\r\n]", buffer + chunk)
+        buffer = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line
     
-    # Create a unique logger for this camera
-    cam_logger = logging.getLogger(f"Camera.{camera_name}")
+    buffer = buffer.strip()
+    if buffer:
+        yield buffer
+
+def camera_index(line, camera_configs):
+    """Return the index of the camera an FFmpeg log line is about, or None."""
+    match = STREAM_TAG_RE.match(line)
+    if match and int(match.group(1)) < len(camera_configs):
+        return int(match.group(1))
     
+    for index, camera_config in enumerate(camera_configs):
+        if camera_config["rtsp_url"].encode() in line or camera_config["youtube_key"].encode() in line:
+            return index
+    return None
+
+async def camera_online(camera_config):
+    """Return True if ffprobe can open the camera's RTSP stream."""
     try:
-        # Launch FFmpeg process
-        process = subprocess.Popen(
-            ffmpeg_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "quiet", "-rtsp_transport", "tcp", camera_config["rtsp_url"],
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
         )
+    except OSError:
+        return False
+    
+    try:
+        return await asyncio.wait_for(process.wait(), timeout=CAMERA_CHECK_TIMEOUT) == 0
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+async def wait_for_cameras(camera_configs):
+    """Return once any of the given cameras can be reached again."""
+    while True:
+        await asyncio.sleep(OFFLINE_RETRY_INTERVAL)
+        online = await asyncio.gather(*(camera_online(config) for config in camera_configs))
+        if any(online):
+            for camera_config, is_online in zip(camera_configs, online):
+                if is_online:
+                    logging.getLogger(f"Camera.{camera_config['name']}").info("Camera is reachable again")
+            return
+
+async def supervise_streams(camera_configs):
+    """Keep every reachable camera streaming, restarting FFmpeg when it exits.
+    
+    FFmpeg exits if it can't open one of its inputs, so cameras that can't be
+    reached are left out of the command instead of stopping the others. Once
+    one of them is back, FFmpeg is restarted to include it.
+    """
+    while True:
+        results = await asyncio.gather(*(camera_online(config) for config in camera_configs))
+        online = [config for config, is_online in zip(camera_configs, results) if is_online]
+        offline = [config for config, is_online in zip(camera_configs, results) if not is_online]
+        for camera_config in offline:
+            logging.getLogger(f"Camera.{camera_config['name']}").warning(
+                f"Camera unreachable, checking again every {OFFLINE_RETRY_INTERVAL} seconds")
         
-        # Store the process
-        stream_processes[camera_name] = process
+        if not online:
+            await wait_for_cameras(offline)
+            continue
         
-        cam_logger.info(f"Stream started with PID: {process.pid}")
+        tasks = [asyncio.create_task(stream_cameras(online))]
+        if offline:
+            tasks.append(asyncio.create_task(wait_for_cameras(offline)))
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Stops FFmpeg too when a camera came back or Ctrl+C was pressed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
         
-        # Monitor process output
-        while process.poll() is None and not stop_event.is_set():
-            line = process.stderr.readline().strip()
-            if not line:
-                continue
-                
-            # Log important information
-            lower_line = line.lower()
-            if "error" in lower_line:
-                cam_logger.error(f"FFmpeg Error: {line}")
-            elif "warning" in lower_line:
-                cam_logger.warning(f"FFmpeg Warning: {line}")
-            elif "speed" in line and "bitrate" in line:
-                cam_logger.info(f"Status: {line}")
+        logger.info(f"Restarting streams in {RESTART_DELAY} seconds...")
+        await asyncio.sleep(RESTART_DELAY)
+
+async def stream_cameras(camera_configs):
+    """Stream all cameras to YouTube with a single FFmpeg process."""
+    # Build the FFmpeg command
+    ffmpeg_cmd = build_ffmpeg_command(camera_configs)
+    
+    # Create a unique logger for each camera, indexed like the FFmpeg outputs
+    cam_loggers = [logging.getLogger(f"Camera.{config['name']}") for config in camera_configs]
+    
+    # Launch FFmpeg process
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_cmd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    
+    logger.info(f"Streams started with PID: {process.pid}")
+    
+    try:
+        # Monitor process output; with -loglevel warning every line FFmpeg
+        # writes is already a warning or an error
+        async for line in read_lines(process.stderr):
+            # Route messages about one camera to that camera's logger
+            index = camera_index(line, camera_configs)
+            message = f"FFmpeg: {line.decode(errors='replace')}"
+            if index is not None:
+                cam_loggers[index].warning(message)
+            else:
+                logger.warning(message)
         
-        # Check why the process ended
-        if stop_event.is_set():
-            cam_logger.info(f"Stream manually stopped for camera: {camera_name}")
-        else:
-            cam_logger.warning(f"Stream ended unexpectedly for camera: {camera_name} with return code {process.returncode}")
+        await process.wait()
+        logger.warning(f"Streams ended unexpectedly with return code {process.returncode}")
     
-    except Exception as e:
-        cam_logger.error(f"Error in stream for camera {camera_name}: {str(e)}")
+    except asyncio.CancelledError:
+        logger.info("Streams stopped")
+        raise
     
     finally:
-        # Remove process from the tracking dictionary
-        if camera_name in stream_processes:
-            del stream_processes[camera_name]
-
-def signal_handler(sig, frame):
-    """Handle Ctrl+C and other termination signals."""
-    logger.info("Stopping all streams... (Ctrl+C detected)")
-    stop_event.set()
-    
-    # Terminate all FFmpeg processes
-    for name, process in list(stream_processes.items()):
-        if process and process.poll() is None:
-            logger.info(f"Terminating stream for camera: {name}")
-            try:
-                process.terminate()
-                # Wait a bit to see if it terminates gracefully
-                time.sleep(2)
-                if process.poll() is None:
-                    # Force kill if still running
-                    process.kill()
-            except Exception as e:
-                logger.error(f"Error terminating process for {name}: {e}")
-    
-    sys.exit(0)
+        await stop_process(process)
+
+async def stop_process(process):
+    """Terminate the FFmpeg process, killing it if it doesn't exit in time."""
+    if process.returncode is None:
+        process.terminate()
+        try:
+            # Wait a bit to see if it terminates gracefully
+            await asyncio.wait_for(process.wait(), timeout=2)
+        except asyncio.TimeoutError:
+            # Force kill if still running
+            process.kill()
+            await process.wait()
+
+async def main_async():
+    """Run all camera streams until Ctrl+C/SIGTERM is received."""
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(supervise_streams(CAMERA_CONFIG))
+    
+    def shutdown():
+        """Handle Ctrl+C and other termination signals."""
+        logger.info("Stopping all streams... (Ctrl+C detected)")
+        task.cancel()
+    
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, shutdown)
+        except NotImplementedError:
+            # Windows: Ctrl+C raises KeyboardInterrupt, which cancels the task
+            pass
+    
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
 
 def validate_config():
     """Validate the camera configurations before starting streams."""
@@ -235,14 +495,16 @@ def validate_config():
 
 def main():
     """Main function to start all camera streams."""
-    # Register signal handler
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
     # Check if FFmpeg is installed
     if not check_dependencies():
         sys.exit(1)
     
+    # Pick the encoder once for all cameras
+    if detect_gpu() == "libx264":
+        logger.info("No hardware encoder found: using libx264 software encoder")
+    else:
+        logger.info(f"Hardware encoding available: using {detect_gpu()}")
+    
     # Validate configurations
     if not validate_config():
         logger.error("Please correct the configuration errors and try again.")
@@ -255,20 +517,8 @@ def main():
     logger.info("Press Ctrl+C to stop all streams")
     logger.info("=" * 50)
     
-    # Create threads for each camera
-    threads = []
-    for config in CAMERA_CONFIG:
-        thread = threading.Thread(target=stream_camera, args=(config,))
-        thread.daemon = True
-        threads.append(thread)
-        thread.start()
-    
-    # Wait for all threads to complete (or until interrupted)
-    try:
-        while any(t.is_alive() for t in threads):
-            time.sleep(1)
-    except KeyboardInterrupt:
-        signal_handler(signal.SIGINT, None)
+    # Stream every reachable camera from one FFmpeg process
+    asyncio.run(main_async())
 
 if __name__ == "__main__":
     main()
@@ -8,7 +8,8 @@ It uses Streamlink and FFmpeg for an alternative streaming approach.
 Usage:
   python streamlink_version.py
 
-Edit the CAMERA_URL and YOUTUBE_KEY variables below before running.
+Edit the CAMERA_URL and YOUTUBE_KEY variables below before running, or set
+them (and CAMERA_USER/CAMERA_PASS) in the environment.
 
 Author: gmdeckard
 Last Updated: 2025
@@ -16,38 +17,177 @@ Last Updated: 2025
 
 import os
 import sys
+import re
+import json
 import time
+import base64
+import shutil
 import signal
+import socket
+import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import fcntl
+    # F_SETPIPE_SZ is Linux-only and only exposed by Python 3.10+
+    F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+except ImportError:
+    # Windows: pipes keep their default size
+    fcntl = None
 
 # ========== EDIT THESE VALUES ==========
+# (the first four can also be set with environment variables of the same name)
 # Your camera's URL or IP address
-CAMERA_URL = "http://camera-ip/"     # Web interface URL
+CAMERA_URL = os.environ.get("CAMERA_URL", "http://camera-ip/")     # Web interface URL
 
 # Your camera login credentials
-CAMERA_USER = "username"
-CAMERA_PASS = "password"
+CAMERA_USER = os.environ.get("CAMERA_USER", "username")
+CAMERA_PASS = os.environ.get("CAMERA_PASS", "password")
 
 # Your YouTube Stream Key from YouTube Studio -> Go Live -> Stream
-YOUTUBE_KEY = "your-stream-key-here"
+YOUTUBE_KEY = os.environ.get("YOUTUBE_KEY", "your-stream-key-here")
+
+# Copy the camera's H.264 video as-is instead of re-encoding it
+# (can also be enabled with --copy)
+PASSTHROUGH = False
 
 # YouTube RTMP URL (don't change unless YouTube changes their endpoint)
 YOUTUBE_URL = f"rtmp://a.rtmp.youtube.com/live2/{YOUTUBE_KEY}"
 # ======================================
 
+# Required executables and the flag used to check that they run
+DEPENDENCIES = {
+    "streamlink": "--version",
+    "ffmpeg": "-version",
+}
+
+# Start FFmpeg's input without probing or demuxer buffering. "nobuffer" can
+# hurt some streams; run with LOW_LATENCY=0 to turn these options off.
+LOW_LATENCY = os.environ.get("LOW_LATENCY", "1") != "0"
+LOW_LATENCY_INPUT_ARGS = [
+    "-fflags", "nobuffer",
+    "-flags", "low_delay",
+]
+
+# Skip stream probing too, but only when re-encoding: stream copy needs the
+# frame size and audio parameters that probing finds
+LOW_LATENCY_PROBE_ARGS = [
+    "-probesize", "32",
+    "-analyzeduration", "0",
+]
+
+# Capacity of the pipe between Streamlink and FFmpeg (Linux default: 64 KiB)
+PIPE_SIZE = 1024 * 1024
+
+# Scheduling priority for FFmpeg; raising it needs root or CAP_SYS_NICE
+FFMPEG_NICE = -5
+
+# Results of earlier dependency and codec checks, so warm starts skip them
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "rtsp2youtube"
+)
+DEPS_CACHE_FILE = os.path.join(CACHE_DIR, "deps.json")
+CODECS_CACHE_FILE = os.path.join(CACHE_DIR, "codecs.json")
+
+# FFmpeg's (major, minor) version as found by check_dependencies(), if known
+ffmpeg_version = None
+
+# Seconds before the camera's codecs are probed again, so quick restarts
+# skip the probe but a change in the camera's settings is picked up
+CODECS_CACHE_TTL = 10 * 60
+
+def load_cache(path):
+    """Load cached probe results from path, or an empty cache."""
+    try:
+        with open(path) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(path, cache):
+    """Save probe results to path; failing to write the cache is harmless."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as cache_file:
+            json.dump(cache, cache_file)
+    except OSError:
+        pass
+
+def run_version_check(path, version_flag):
+    """Run an executable with its version flag.
+    
+    Returns the first line of its output, or None if it doesn't run.
+    """
+    try:
+        result = subprocess.run(
+            [path, version_flag],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            check=True
+        )
+    except (subprocess.SubprocessError, OSError):
+        return None
+    
+    lines = result.stdout.splitlines()
+    return lines[0] if lines else ""
+
+def parse_ffmpeg_version(version_line):
+    """Return FFmpeg's (major, minor) version, or None for unknown or git builds."""
+    # e.g. "ffmpeg version 4.4.2-0ubuntu0.22.04.1 Copyright ..." or "ffmpeg version n6.1"
+    match = re.match(r"ffmpeg version n?(\d+)\.(\d+)", version_line or "")
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return None
+
 def check_dependencies():
-    """Check if Streamlink and FFmpeg are installed."""
+    """Check if Streamlink and FFmpeg are installed.
+    
+    Each executable is located with shutil.which() and only run with its
+    version flag when its path, size or modification time differs from the
+    cached result of an earlier successful check. Executables that do need
+    running are checked concurrently. Also sets ffmpeg_version.
+    """
+    global ffmpeg_version
+    
     missing = []
+    cache = load_cache(DEPS_CACHE_FILE)
+    to_check = {}
     
-    try:
-        subprocess.run(["streamlink", "--version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-    except (subprocess.SubprocessError, FileNotFoundError):
-        missing.append("streamlink")
+    for name, version_flag in DEPENDENCIES.items():
+        path = shutil.which(name)
+        if path is None:
+            missing.append(name)
+            continue
         
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-    except (subprocess.SubprocessError, FileNotFoundError):
-        missing.append("ffmpeg")
+        stat = os.stat(path)
+        fingerprint = [path, stat.st_mtime, stat.st_size]
+        # Entries look like [path, mtime, size, first line of version output]
+        entry = cache.get(name)
+        if not entry or len(entry) != 4 or entry[:3] != fingerprint:
+            to_check[name] = fingerprint
+    
+    if to_check:
+        # The threads just wait on the child processes, so they overlap fully
+        with ThreadPoolExecutor(max_workers=len(to_check)) as executor:
+            results = {
+                name: executor.submit(run_version_check, fingerprint[0], DEPENDENCIES[name])
+                for name, fingerprint in to_check.items()
+            }
+            
+        for name, result in results.items():
+            if result.result() is not None:
+                cache[name] = to_check[name] + [result.result()]
+            else:
+                missing.append(name)
+        
+        save_cache(DEPS_CACHE_FILE, cache)
+    
+    if "ffmpeg" not in missing:
+        ffmpeg_version = parse_ffmpeg_version(cache["ffmpeg"][3])
         
     if missing:
         print(f"Error: The following dependencies are missing: {', '.join(missing)}")
@@ -60,8 +200,144 @@ def check_dependencies():
         
     return True
 
+def camera_headers():
+    """Return the HTTP headers needed to access the camera."""
+    # Streamlink has no basic-auth options, so send the header ourselves;
+    # the credentials must be base64-encoded or the camera rejects them
+    token = base64.b64encode(f"{CAMERA_USER}:{CAMERA_PASS}".encode()).decode()
+    return {
+        "Referer": CAMERA_URL,
+        "Authorization": f"Basic {token}",
+    }
+
+def probe_codecs():
+    """Return the camera stream's (video, audio) codec names, or None if unknown.
+    
+    Streamlink resolves the stream URL and ffprobe reads its codecs. The
+    result is cached per camera URL for CODECS_CACHE_TTL seconds, so quick
+    restarts skip the probe.
+    """
+    cache = load_cache(CODECS_CACHE_FILE)
+    entry = cache.get(CAMERA_URL)
+    # Entries look like [video, audio, time probed]
+    if entry and len(entry) == 3 and 0 <= time.time() - entry[2] < CODECS_CACHE_TTL:
+        return tuple(entry[:2])
+    
+    headers = camera_headers()
+    streamlink_headers = []
+    for name, value in headers.items():
+        streamlink_headers.extend(["--http-header", f"{name}={value}"])
+    
+    try:
+        result = subprocess.run(
+            ["streamlink", "--stream-url", CAMERA_URL, "best"] + streamlink_headers,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=30,
+            check=True
+        )
+        stream_url = result.stdout.strip()
+        
+        result = subprocess.run(
+            ["ffprobe", "-v", "error",
+             "-headers", "".join(f"{name}: {value}\r\n" for name, value in headers.items()),
+             "-show_entries", "stream=codec_type,codec_name",
+             "-of", "csv=p=0", stream_url],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=30,
+            check=True
+        )
+    except (subprocess.SubprocessError, OSError):
+        return None
+    
+    # Lines look like "h264,video" and "aac,audio"; keep the first of each type
+    codecs = {}
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) >= 2:
+            codecs.setdefault(fields[1], fields[0])
+    if "video" not in codecs:
+        return None
+    
+    cache[CAMERA_URL] = [codecs["video"], codecs.get("audio"), time.time()]
+    save_cache(CODECS_CACHE_FILE, cache)
+    return codecs["video"], codecs.get("audio")
+
+def resolve_camera_url():
+    """Return CAMERA_URL with its hostname replaced by the resolved IP address.
+    
+    Looking the camera up once here saves Streamlink a DNS lookup on every
+    (re)connect. HTTPS URLs and failed lookups keep the original hostname.
+    """
+    parts = urlsplit(CAMERA_URL)
+    if not parts.hostname or parts.scheme == "https":
+        return CAMERA_URL
+    
+    try:
+        address = socket.getaddrinfo(parts.hostname, parts.port, type=socket.SOCK_STREAM,
+                                     flags=socket.AI_ADDRCONFIG)[0][4][0]
+    except (socket.gaierror, UnicodeError):
+        return CAMERA_URL
+    
+    if ":" in address:
+        address = f"[{address}]"  # IPv6
+    netloc = address if parts.port is None else f"{address}:{parts.port}"
+    if "@" in parts.netloc:
+        netloc = parts.netloc.rsplit("@", 1)[0] + "@" + netloc
+    return urlunsplit(parts._replace(netloc=netloc))
+
+def set_pipe_size(fd, size):
+    """Grow a pipe's buffer, clamped to the system's maximum pipe size.
+    
+    Both ends of a pipe share one buffer, so either descriptor will do.
+    Unprivileged processes can't go above /proc/sys/fs/pipe-max-size.
+    """
+    if fcntl is None:
+        return
+    
+    try:
+        with open("/proc/sys/fs/pipe-max-size") as f:
+            size = min(size, int(f.read()))
+    except (OSError, ValueError):
+        pass
+    
+    try:
+        fcntl.fcntl(fd, F_SETPIPE_SZ, size)
+    except OSError:
+        pass  # Keep the default pipe size
+
+def pin_processes(streamlink_pid):
+    """Give FFmpeg (this process, before exec) and Streamlink their own CPUs.
+    
+    Streamlink only copies bytes, so it gets the last CPU and FFmpeg the
+    rest. FFmpeg's priority is also raised where permitted. Both settings
+    survive the exec into FFmpeg. Linux only; failures are ignored.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        if len(cpus) >= 2:
+            try:
+                os.sched_setaffinity(streamlink_pid, cpus[-1:])
+                os.sched_setaffinity(0, cpus[:-1])
+            except OSError:
+                pass
+    
+    if hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, FFMPEG_NICE)
+        except OSError:
+            pass  # Not permitted; keep the default priority
+
 def start_stream():
     """Start streaming from camera to YouTube using Streamlink and FFmpeg."""
+    # Python ignores SIGPIPE and an ignored signal stays ignored across exec,
+    # so restore the default before this process becomes FFmpeg
+    if hasattr(signal, "SIGPIPE"):
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    
     # Print header
     print("=" * 50)
     print("TP-Link Tapo C121 to YouTube Live Stream (Streamlink)")
@@ -71,85 +347,145 @@ def start_stream():
     print("Press Ctrl+C to stop streaming")
     print("=" * 50)
     
-    # Streamlink command to get the HLS stream from the camera
+    # FFmpeg codec settings: YouTube takes H.264 + AAC as-is, so only
+    # transcode what the camera doesn't already send in those codecs
+    codecs = probe_codecs()
+    if codecs == ("h264", "aac"):
+        print("Camera sends H.264/AAC: copying both without re-encoding")
+        codec_args = ["-c:v", "copy", "-c:a", "copy", "-bsf:a", "aac_adtstoasc"]
+    elif PASSTHROUGH:
+        codec_args = ["-c:v", "copy", "-bsf:v", "h264_mp4toannexb", "-c:a", "aac", "-b:a", "128k"]
+    else:
+        # Pin x264's no-lookahead, no-B-frame settings and split each frame
+        # across two slice threads, so no frames are buffered in the encoder
+        codec_args = ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+                      "-x264-params", "sliced-threads=1:sync-lookahead=0:rc-lookahead=0:bframes=0",
+                      "-threads", "2",
+                      "-b:v", "2000k", "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "128k"]
+    
+    # Streamlink command writing the camera's stream to stdout
     streamlink_cmd = [
         "streamlink",
-        "--player-external-http",
-        "--player", "ffmpeg",
-        "--player-args",
-        (f'-i - -c:v libx264 -preset ultrafast -tune zerolatency -b:v 2000k '
-         f'-pix_fmt yuv420p -c:a aac -b:a 128k -f flv "{YOUTUBE_URL}"'),
-        f"{CAMERA_URL}",
+        "--stdout",
+        resolve_camera_url(),
         "best",
-        "--http-header", "Referer= "{CAMERA_URL}"",
-        "--http-header", f"Authorization=Basic {CAMERA_USER}:{CAMERA_PASS}"
     ]
+    for name, value in camera_headers().items():
+        streamlink_cmd.extend(["--http-header", f"{name}={value}"])
     
-    # Set up signal handler for clean exit
-    process = None
+    # FFmpeg command reading that stream from stdin and pushing it to YouTube
+    ffmpeg_cmd = ["ffmpeg"]
+    if ffmpeg_version and ffmpeg_version >= (4, 4):
+        # Refresh the status line every 5 seconds rather than twice a second;
+        # older versions refuse to start with this option
+        ffmpeg_cmd.extend(["-stats_period", "5"])
+    if LOW_LATENCY:
+        ffmpeg_cmd.extend(LOW_LATENCY_INPUT_ARGS)
+        if "copy" not in codec_args:
+            ffmpeg_cmd.extend(LOW_LATENCY_PROBE_ARGS)
+    ffmpeg_cmd.extend(["-i", "pipe:0"] + codec_args + ["-f", "flv", YOUTUBE_URL])
     
-    def signal_handler(sig, frame):
-        print("\nStopping stream (Ctrl+C detected)...")
-        if process and process.poll() is None:
-            process.terminate()
-            time.sleep(1)
-            if process.poll() is None:
-                process.kill()
-        sys.exit(0)
+    # Join Streamlink's stdout to FFmpeg's stdin with a plain OS pipe, so no
+    # local HTTP server sits between them
+    read_fd, write_fd = os.pipe()
+    set_pipe_size(write_fd, PIPE_SIZE)
     
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
-    # Launch Streamlink process
+    # Launch Streamlink in the background; it logs straight to this terminal
     print("Starting streaming process...")
-    process = subprocess.Popen(
+    # An absolute executable path and close_fds=False let subprocess use
+    # posix_spawn() instead of forking the interpreter; no descriptors leak,
+    # since Python opens its own files non-inheritable. A process_group or
+    # start_new_session argument would force the fork path again.
+    streamlink_process = subprocess.Popen(
         streamlink_cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1
+        executable=shutil.which(streamlink_cmd[0]) or streamlink_cmd[0],
+        stdout=write_fd,
+        close_fds=False
     )
+    os.close(write_fd)
+    print(f"Streamlink started with PID: {streamlink_process.pid}")
+    
+    pin_processes(streamlink_process.pid)
     
-    print(f"Stream started with PID: {process.pid}")
+    # Windows has no real exec: os.execvp starts a new process and exits,
+    # handing the console back while FFmpeg keeps running
+    if os.name == "nt":
+        ffmpeg_process = subprocess.Popen(ffmpeg_cmd, stdin=read_fd)
+        os.close(read_fd)
+        return wait_for_processes(ffmpeg_process, streamlink_process)
     
+    # Replace this process with FFmpeg reading the pipe on stdin. Ctrl+C
+    # reaches both programs through the terminal, and whichever one exits
+    # first takes the other down with EOF or a broken pipe.
+    os.dup2(read_fd, sys.stdin.fileno())
+    os.close(read_fd)
+    sys.stdout.flush()
+    os.execvp(ffmpeg_cmd[0], ffmpeg_cmd)
+
+def wait_for_processes(ffmpeg_process, streamlink_process):
+    """Wait until FFmpeg and Streamlink exit and return FFmpeg's exit code."""
     try:
-        # Monitor process and print output
-        for line in process.stderr:
-            if "error" in line.lower() or "warning" in line.lower():
-                print(f"Error: {line.strip()}")
-            else:
-                print(f"Status: {line.strip()}")
+        ffmpeg_process.wait()
+        # Streamlink gets a broken pipe once FFmpeg is gone
+        streamlink_process.wait()
     
     except KeyboardInterrupt:
-        signal_handler(signal.SIGINT, None)
+        print("\nStopping stream (Ctrl+C detected)...")
+        for process in (ffmpeg_process, streamlink_process):
+            # The console sends Ctrl+C to both; kill whichever doesn't exit
+            try:
+                process.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
     
-    return process.poll()
+    return ffmpeg_process.returncode
+
+def parse_arguments():
+    """Parse command line arguments."""
+    global PASSTHROUGH
+    
+    parser = argparse.ArgumentParser(description='Streamlink Camera Stream to YouTube Live')
+    parser.add_argument('--copy', action='store_true', default=PASSTHROUGH,
+                        help="Copy the camera's H.264 video instead of re-encoding it")
+    args = parser.parse_args()
+    
+    # Update global variables based on args
+    PASSTHROUGH = args.copy
 
 if __name__ == "__main__":
+    # Parse command line arguments
+    parse_arguments()
+    
     # Validate the YouTube stream key
     if YOUTUBE_KEY == "your-stream-key-here":
-        print("ERROR: Please edit this script to set your YouTube Stream Key.")
-        print("1. Open streamlink_version.py in a text editor")
-        print("2. Find the YOUTUBE_KEY variable near the top")
-        print("3. Replace 'your-stream-key-here' with your actual key from YouTube Studio")
+        sys.stderr.write(
+            "ERROR: Please edit this script to set your YouTube Stream Key.\n"
+            "1. Open streamlink_version.py in a text editor\n"
+            "2. Find the YOUTUBE_KEY variable near the top\n"
+            "3. Replace 'your-stream-key-here' with your actual key from YouTube Studio\n"
+            "Alternatively, set the YOUTUBE_KEY environment variable.\n"
+        )
         sys.exit(1)
     
     # Validate the camera credentials
     if CAMERA_USER == "username" or CAMERA_PASS == "password":
-        print("ERROR: Please edit this script to set your camera's login credentials.")
-        print("1. Open streamlink_version.py in a text editor")
-        print("2. Find the CAMERA_USER and CAMERA_PASS variables near the top")
-        print("3. Replace them with your actual camera login details")
+        sys.stderr.write(
+            "ERROR: Please edit this script to set your camera's login credentials.\n"
+            "1. Open streamlink_version.py in a text editor\n"
+            "2. Find the CAMERA_USER and CAMERA_PASS variables near the top\n"
+            "3. Replace them with your actual camera login details\n"
+            "Alternatively, set the CAMERA_USER and CAMERA_PASS environment variables.\n"
+        )
         sys.exit(1)
     
     # Check if dependencies are available
     if not check_dependencies():
         sys.exit(1)
     
-    # Start streaming
+    # Start streaming; on Linux and macOS this process becomes FFmpeg
     try:
-        exit_code = start_stream()
-        sys.exit(exit_code)
+        sys.exit(start_stream())
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)